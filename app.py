@@ -8,21 +8,53 @@ from email.message import EmailMessage
 from functools import wraps
 # from flask_login import login_required, current_user
 import secrets, hashlib
+import click
 from bson import ObjectId
 from config import settings
-from db import db, ping
+from db import db, ensure_indexes
 from auth import auth_bp
+from task_import import import_bp
+from archive import archive_bp, iter_completed_tasks, monthly_summary
+from task_filters import build_task_query, sort_spec, facet_counts, parse_tags
+from task_hooks import after_task_write
+import smart_lists
+from rate_limit import init_rate_limiter
+from assets import assets_bp, init_assets
+from json_provider import FastJSONProvider
+from cache_bus import VersionedCache
+import cache_bus
+from task_versions import expected_version, version_filter
+from read_routing import init_read_routing, read_db
+from health import health_bp, monitor
+from urgency import urgency_bp, urgency_score
+from calendar_view import calendar_bp
 from datetime import datetime, timedelta, timezone
 from werkzeug.security import check_password_hash, generate_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
 from todo_AddDelete import register_task_routes
 from bson import ObjectId
 from flask import session, redirect, url_for, flash
 
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.config.from_object(settings)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev')
+if settings.TRUSTED_PROXIES:
+    # real client address (rate limits key on it) from the proxies' X-Forwarded-For
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=settings.TRUSTED_PROXIES, x_proto=settings.TRUSTED_PROXIES)
 app.register_blueprint(auth_bp)
+app.register_blueprint(import_bp)
+app.register_blueprint(archive_bp)
+app.register_blueprint(assets_bp)
+app.register_blueprint(health_bp)
+app.register_blueprint(urgency_bp)
+app.register_blueprint(calendar_bp)
+init_rate_limiter(app)
+init_assets(app)
+init_read_routing(app)
+
+_user_cache = VersionedCache(cache_bus.versions)
 
 # ---------- Helpers ----------
 def _hash_token(token: str) -> str:
@@ -47,7 +79,8 @@ def load_current_user():
     uid = session.get("user_id")
     if uid:
         from bson import ObjectId
-        user = db.users.find_one({"_id": ObjectId(uid)}, {"password_hash": 0})
+        # cached per worker; invalidated across workers through cache_bus
+        user = _user_cache.get_or_set(uid, "user", lambda: db.users.find_one({"_id": ObjectId(uid)}, {"password_hash": 0}))
         g.current_user = user
 
 @app.context_processor
@@ -62,6 +95,14 @@ def current_uid():
     uid = session.get("user_id")
     return ObjectId(uid) if uid and ObjectId.is_valid(uid) else None
 
+def user_categories(uid):
+    """The user's categories sorted by name (cached until the user's next write).
+
+    Loaded from the primary: the cache is shared by every session of the
+    user, so a lagging secondary read would outlive the read-your-writes window.
+    """
+    return _user_cache.get_or_set(uid, "categories", lambda: list(db["categories"].find({"user_id": uid}).sort("name", 1)))
+
 
 
 # ---------- Sample data (can delete later) ----------
@@ -134,6 +175,7 @@ def add_task():
         status = (data.get("status") or "todo").lower()
         due_date_str = data.get("due_date")
         description = (data.get("description") or "").strip()
+        tags = parse_tags(data.get("tags"))
 
         if not title:
             return redirect(url_for("add_task"))
@@ -159,13 +201,17 @@ def add_task():
             "status": status,
             "due_date": due_date,
             "description": description,
+            "tags": tags,
             "created_at": now,
             "updated_at": now,
+            "version": 1,
         }
+        task_doc["urgency"] = urgency_score(task_doc, now)
 
-        db.tasks.insert_one(task_doc)
+        result = db.tasks.insert_one(task_doc)
+        after_task_write(uid, result.inserted_id)
         return redirect(url_for("dashboard"), code=303)
-    cats = list(db["categories"].find({"user_id": uid}).sort("name", 1))
+    cats = user_categories(uid)
     categories = [{"id": str(c["_id"]), "name": c.get("name", "")} for c in cats]
 
     return render_template("add_task.html", categories=categories)
@@ -181,14 +227,16 @@ def complete_task(task_id):
         return redirect(url_for("dashboard"))
 
     from datetime import datetime
-    db.tasks.update_one(
+    result = db.tasks.update_one(
         {"_id": ObjectId(task_id), "user_id": uid},
         {"$set": {
             "status": "done",
             "completed_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
-        }}
+        }, "$inc": {"version": 1}}
     )
+    if result.matched_count:
+        after_task_write(uid, task_id)
 
     return redirect(url_for("dashboard"))
 
@@ -218,6 +266,7 @@ def edit_task(task_id):
         status = (data.get("status") or "todo").lower()
         due_date_str = data.get("due_date")
         description = (data.get("description") or "").strip()
+        tags = parse_tags(data.get("tags"))
 
         if not title:
             return redirect(url_for("edit_task", task_id=task_id))
@@ -237,9 +286,12 @@ def edit_task(task_id):
         priority_map = {"high": 1, "medium": 2, "low": 3}
         priority_val = priority_map.get(priority, 2)
 
+        # Only overwrite the version the form was loaded from
+        expected = expected_version(request, data)
+
         from datetime import datetime
-        db.tasks.update_one(
-            {"_id": ObjectId(task_id)},
+        result = db.tasks.update_one(
+            {"_id": ObjectId(task_id), "user_id": uid, **version_filter(expected)},
             {"$set": {
                 "title": title,
                 "category_id": cat_id,
@@ -247,13 +299,20 @@ def edit_task(task_id):
                 "status": status,
                 "due_date": due_date,
                 "description": description,
+                "tags": tags,
                 "updated_at": datetime.utcnow()
-            }}
+            }, "$inc": {"version": 1}}
         )
+        if result.matched_count == 0:
+            if request.headers.get("If-Match"):
+                return jsonify({"error": "version conflict"}), 409
+            flash("This task was changed somewhere else. Review the latest version and save again.", "error")
+            return redirect(url_for("edit_task", task_id=task_id), code=303)
+        after_task_write(uid, task_id)
         return redirect(url_for("dashboard"), code=303)
 
     # GET request - show edit form
-    cats = list(db["categories"].find({"user_id": uid}).sort("name", 1))
+    cats = user_categories(uid)
     categories = [{"id": str(c["_id"]), "name": c.get("name", "")} for c in cats]
 
     def pri_to_text(p):
@@ -268,7 +327,9 @@ def edit_task(task_id):
         "priority": pri_to_text(task.get("priority", "Medium")),
         "status": task.get("status", "todo"),
         "due_date": task.get("due_date").strftime("%Y-%m-%d") if task.get("due_date") else "",
-        "description": task.get("description", "")
+        "description": task.get("description", ""),
+        "tags": ", ".join(task.get("tags") or []),
+        "version": task.get("version", 0),
     }
 
     return render_template("edit_task.html", task=task_data, categories=categories)
@@ -281,19 +342,13 @@ def history():
         return redirect(url_for("login"))
     
     # Get user's categories
-    cats = list(db["categories"].find({"user_id": uid}).sort("name", 1))
+    cats = user_categories(uid)
     categories = [{"id": str(c["_id"]), "name": c.get("name", "")} for c in cats]
     cat_map = {c["_id"]: c.get("name", "") for c in cats}
     
-    # Get completed tasks
-    completed_tasks_raw = list(db["tasks"].find({
-        "user_id": uid,
-        "status": "done"
-    }).sort("updated_at", -1))
-    
-    # Add category names to tasks
+    # Get completed tasks (live collection + archive, merged by updated_at)
     completed_tasks = []
-    for t in completed_tasks_raw:
+    for t in iter_completed_tasks(uid, read_db()):
         cname = cat_map.get(t.get("category_id"), "")
         completed_tasks.append({
             "id": str(t["_id"]),
@@ -303,7 +358,11 @@ def history():
             "completed_date": t.get("updated_at", "")
         })
     
-    return render_template("todo_history.html", tasks=completed_tasks, categories=categories)
+    # Per-month counts for tasks already moved to the archive tier
+    archived_months = monthly_summary(uid, read_db())
+
+    return render_template("todo_history.html", tasks=completed_tasks, categories=categories,
+                           archived_months=archived_months)
 # 解释一下：上面被注释掉的代码都是我原来实现用url取userid的逻辑，下面新的代码都是需要登陆后从user session里面取id。目前全部实现代码我都改成了要求登陆，
 # 如果有问题可以把下面的代码注释了，把上面代码取消注释就可以看我原来的代码实现逻辑。
 # AAA: 把上面取消注释下面注释起来
@@ -370,53 +429,29 @@ def dashboard():
         # NOTE: 登录后不再从 URL 拿 user_id；直接从 session 取
     uid = current_uid()
 
-    category = request.args.get('category', 'all')
     sort_type = request.args.get('sort', 'default')
     search_query = request.args.get('search', '').strip()
 
-    cat_query = {"user_id": uid} if uid else {}
-    cats = list(db["categories"].find(cat_query).sort("name", 1))
+    cats = user_categories(uid)
+
+    # category / search / tags / priority / due-date range / status filters
+    q = build_task_query(uid, request.args, cats)
+    facets = facet_counts(q, read_db())
+
+    tasks_cur = db["tasks"].find(q).sort(sort_spec(sort_type))
+    # top-N, e.g. ?sort=smart&limit=10 reads just the first N index entries
+    limit = request.args.get('limit', type=int)
+    if limit and limit > 0:
+        tasks_cur = tasks_cur.limit(limit)
+
+    return _render_dashboard(uid, cats, tasks_cur, search_query=search_query, facets=facets)
+
+
+def _render_dashboard(uid, cats, tasks_cur, **extra):
+    """Shared by the dashboard and smart lists: format rows + upcoming deadlines and render."""
     categories = [{"id": str(c["_id"]), "name": c.get("name", "")} for c in cats]
     cat_map = {c["_id"]: c.get("name", "") for c in cats}
 
-    q = {"user_id": uid} if uid else {}
-
-    # Exclude completed tasks from dashboard (they should only appear in history)
-    q["status"] = {"$ne": "done"}
-
-    if category and category != "all":
-        if ObjectId.is_valid(category):
-            q["category_id"] = ObjectId(category)
-        else:
-            found = next((c for c in cats if c.get("name") == category), None)
-            if found:
-                q["category_id"] = found["_id"]
-
-    # Add search functionality
-    if search_query:
-        # Search in title and description using regex 
-        q["$or"] = [
-            {"title": {"$regex": search_query, "$options": "i"}},
-            {"description": {"$regex": search_query, "$options": "i"}}
-        ]
-
-    # Determine sorting based on sort_type parameter
-    if sort_type == 'priority':
-        # Sort by priority (1=high, 2=medium, 3=low) then by due_date (closer first)
-        tasks_cur = db["tasks"].find(q).sort([
-            ("priority", 1),  # Priority ascending (high=1 first)
-            ("due_date", 1)   # Due date ascending (closer dates first)
-        ])
-    elif sort_type == 'due_date':
-        # Sort by due_date (closer first), then by priority
-        tasks_cur = db["tasks"].find(q).sort([
-            ("due_date", 1),  # Due date ascending (closer dates first)
-            ("priority", 1)   # Priority ascending (high=1 first)
-        ])
-    else:
-        # Default sorting by updated_at
-        tasks_cur = db["tasks"].find(q).sort("updated_at", -1)
-
     def pri_to_text(p):
         if isinstance(p, str): return p
         return {1: "High", 2: "Medium", 3: "Low"}.get(p, "Medium")
@@ -436,6 +471,7 @@ def dashboard():
             "status": t.get("status", "Pending"),
             "priority": pri_to_text(t.get("priority", "Medium")),
             "due_date": due_date_str,
+            "tags": t.get("tags") or [],
         })
 
         # Calculate days until deadline for upcoming tasks
@@ -458,7 +494,40 @@ def dashboard():
 
     user = {"username": g.current_user.get("name", "User") if g.current_user else "User"}
 
-    return render_template("dashboard.html", user=user, categories=categories, tasks=tasks, upcoming_deadlines=upcoming_deadlines, search_query=search_query)
+    extra.setdefault("search_query", "")
+    extra.setdefault("facets", None)
+    return render_template("dashboard.html", user=user, categories=categories, tasks=tasks,
+                           upcoming_deadlines=upcoming_deadlines, smart_lists=smart_lists.list_for_user(uid), **extra)
+
+
+# ---------- Smart lists ----------
+@app.post("/smart-lists")
+@login_required_view
+def save_smart_list():
+    uid = current_uid()
+    name = (request.form.get("name") or "").strip()
+    if not name:
+        flash("Give the list a name.", "error")
+        return redirect(url_for("dashboard", **request.form.to_dict()))
+    lst = smart_lists.save(uid, name, request.form)
+    return redirect(url_for("smart_list_view", list_id=str(lst["_id"])), code=303)
+
+@app.get("/smart-lists/<list_id>")
+@login_required_view
+def smart_list_view(list_id):
+    uid = current_uid()
+    lst = smart_lists.get(uid, list_id)
+    if not lst:
+        return redirect(url_for("dashboard"))
+    cats = user_categories(uid)
+    return _render_dashboard(uid, cats, smart_lists.load_tasks(lst), active_list={"id": list_id, "name": lst["name"]})
+
+@app.post("/smart-lists/<list_id>/delete")
+@login_required_view
+def delete_smart_list(list_id):
+    smart_lists.delete(current_uid(), list_id)
+    return redirect(url_for("dashboard"), code=303)
+
 
 # AAA: 把上面取消注释下面注释起来
 # @app.post("/api/categories")
@@ -490,24 +559,6 @@ def dashboard():
 #         return redirect(url_for("dashboard", category="all", user_id=user_id), code=303)
 #     return jsonify({"created": True, "name": name}), 201
 
-@app.post("/api/tasks/<task_id>/delete")
-@login_required_view
-def delete_task(task_id):
-    uid = session.get("user_id")
-    if not uid:
-        return redirect(url_for("login"))
-
-    # Validate id
-    if not ObjectId.is_valid(task_id):
-        flash("Invalid task id.", "error")
-        return redirect(url_for("dashboard"))
-
-    # Delete only if it belongs to the current user
-    db.tasks.delete_one({"_id": ObjectId(task_id), "user_id": ObjectId(uid)})
-
-    flash("Task deleted.", "success")
-    return redirect(url_for("dashboard"), code=303)
-
 @app.post("/api/categories")
 @login_required_view
 def api_add_category():
@@ -530,6 +581,7 @@ def api_add_category():
                 if request.form else jsonify({"created": False, "reason": "exists"}), 200)
 
     db["categories"].insert_one({"user_id": uid, "name": name})
+    cache_bus.bump(uid)
 
     if request.form:
         return redirect(url_for("dashboard", category="all"), code=303)
@@ -587,10 +639,21 @@ def reset_password_post():
     session.pop("pw_reset_uid", None)
     flash("Your password has been reset. Please log in.", "success")
     return redirect(url_for("login"))
+# ---------- CLI ----------
+@app.cli.command("init-indexes")
+def init_indexes_command():
+    """Create MongoDB indexes."""
+    ensure_indexes()
+    click.echo("Indexes created.")
+
+# JSON task API (also handles the dashboard's delete form); registered last so the routes above take precedence
+register_task_routes(app)
+
 # ---------- Health check ----------
 @app.get("/test")
 def health():
-    return {"status": "ok", "db": "ok" if ping() else "down"}, 200
+    # cached by the background monitor; see /healthz and /readyz
+    return {"status": "ok", "db": monitor.snapshot()["db"]}, 200
 
 if __name__ == "__main__":
     app.run(debug=True, port=3000)
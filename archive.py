@@ -0,0 +1,155 @@
+# archive.py
+"""Archive tier for completed tasks.
+
+Done tasks older than ``ARCHIVE_AFTER_DAYS`` are moved out of ``tasks`` into
+``tasks_archive`` so the hot collection (and the indexes the dashboard uses)
+only holds live work. A per-user, per-month roll-up, rebuilt from the
+archive on every run, is kept in ``tasks_archive_summary``. Readers should go through ``iter_completed_tasks``
+which merges both tiers.
+"""
+import heapq
+import zlib
+from datetime import datetime, timedelta
+
+import click
+from bson import Binary
+from flask import Blueprint
+from pymongo.errors import BulkWriteError
+
+import cache_bus
+from config import settings
+from db import db
+
+archive_bp = Blueprint("archive", __name__, cli_group=None)
+
+BATCH_SIZE = 500
+DUPLICATE_KEY = 11000
+SUMMARY_KEY = [("user_id", 1), ("month", 1)]
+
+
+def _compress(doc):
+    desc = doc.pop("description", None)
+    if desc:
+        doc["description_z"] = Binary(zlib.compress(desc.encode("utf-8")))
+    return doc
+
+
+def _decompress(doc):
+    blob = doc.pop("description_z", None)
+    if blob is not None:
+        doc["description"] = zlib.decompress(blob).decode("utf-8")
+    return doc
+
+
+def rebuild_summary(user_ids, database=None):
+    """Recompute the monthly roll-up for ``user_ids`` from ``tasks_archive``.
+
+    The summary is derived from the archive and written with ``$merge``
+    (replace per user/month) rather than incremented, so running it again
+    after a crash gives the same result.
+    """
+    database = db if database is None else database
+    done_at = {"$ifNull": ["$completed_at", "$updated_at"]}
+    priority = {"$ifNull": ["$priority", 2]}
+    by_priority = {f"priority_{p}": {"$sum": {"$cond": [{"$eq": [priority, p]}, 1, 0]}} for p in (1, 2, 3)}
+    database.tasks_archive.aggregate([
+        {"$match": {"user_id": {"$in": list(user_ids)}, "status": "done"}},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "month": {"$dateToString": {"format": "%Y-%m", "date": done_at}}},
+            "count": {"$sum": 1},
+            **by_priority,
+        }},
+        {"$match": {"_id.month": {"$ne": None}}},
+        {"$project": {"_id": 0, "user_id": "$_id.user_id", "month": "$_id.month", "count": 1,
+                      **{name: 1 for name in by_priority}}},
+        {"$merge": {"into": "tasks_archive_summary", "on": ["user_id", "month"],
+                    "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ])
+
+
+def archive_completed_tasks(older_than_days=None, compress=None, batch_size=BATCH_SIZE):
+    """Move done tasks older than the cutoff into the archive. Returns the count moved."""
+    days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    compress = settings.ARCHIVE_COMPRESS if compress is None else compress
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    q = {"status": "done", "updated_at": {"$lt": cutoff}}
+
+    # $merge in rebuild_summary needs a unique index on its "on" fields
+    db.tasks_archive_summary.create_index(SUMMARY_KEY, unique=True)
+
+    moved = 0
+    while True:
+        batch = list(db.tasks.find(q).limit(batch_size))
+        if not batch:
+            break
+
+        now = datetime.utcnow()
+        ids = [d["_id"] for d in batch]
+        user_ids = {d["user_id"] for d in batch}
+        for d in batch:
+            d["archived_at"] = now
+            if compress:
+                _compress(d)
+
+        try:
+            db.tasks_archive.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # A previous run may have copied some of these before it died; that's fine.
+            if any(err.get("code") != DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+                raise
+        # Roll up before deleting: if we die in between, the next run finds
+        # the same tasks again and the rebuild is idempotent.
+        rebuild_summary(user_ids)
+        # Same predicate as the find: a task reopened or edited meanwhile stays
+        # live, and its now-stale archive copy is dropped again.
+        deleted = db.tasks.delete_many({"_id": {"$in": ids}, **q}).deleted_count
+        if deleted < len(ids):
+            kept = [d["_id"] for d in db.tasks.find({"_id": {"$in": ids}}, {"_id": 1})]
+            if kept:
+                db.tasks_archive.delete_many({"_id": {"$in": kept}})
+                rebuild_summary(user_ids)
+        moved += deleted
+        for uid in user_ids:
+            cache_bus.bump(uid)
+
+    return moved
+
+
+def iter_tasks(uid, status=None, database=None, projection=None):
+    """Yield a user's tasks (optionally one status) from both tiers, newest ``updated_at`` first.
+
+    Only done tasks are ever archived, so the archive is skipped for any
+    other status.
+    """
+    database = db if database is None else database
+    q = {"user_id": uid}
+    if status:
+        q["status"] = status
+    hot = database.tasks.find(q, projection).sort("updated_at", -1)
+    if status not in (None, "done"):
+        return iter(hot)
+    cold_projection = projection
+    if projection and projection.get("description"):
+        cold_projection = {**projection, "description_z": 1}
+    cold = (_decompress(d) for d in database.tasks_archive.find(q, cold_projection).sort("updated_at", -1))
+    return heapq.merge(hot, cold, key=lambda t: t.get("updated_at") or datetime.min, reverse=True)
+
+
+def iter_completed_tasks(uid, database=None, projection=None):
+    """Yield a user's done tasks from both tiers, newest ``updated_at`` first."""
+    return iter_tasks(uid, "done", database, projection)
+
+
+def monthly_summary(uid, database=None):
+    """Archived completion counts per month for a user, newest first."""
+    database = db if database is None else database
+    return list(database.tasks_archive_summary.find({"user_id": uid}, {"_id": 0, "user_id": 0}).sort("month", -1))
+
+
+@archive_bp.cli.command("archive-tasks")
+@click.option("--days", type=int, default=None, help="Archive done tasks older than this (default: ARCHIVE_AFTER_DAYS).")
+@click.option("--compress/--no-compress", default=None, help="Store descriptions zlib-compressed.")
+def archive_tasks_command(days, compress):
+    """Move old completed tasks into the archive collection."""
+    moved = archive_completed_tasks(days, compress)
+    click.echo(f"Archived {moved} task(s).")
@@ -0,0 +1,154 @@
+# assets.py
+"""Static asset pipeline: fingerprint + minify + precompress, and serve with long caching.
+
+``flask build-assets`` copies everything under ``static/`` into
+``static/dist/`` with a content hash in the file name (CSS is minified, and
+its ``url(/static/...)`` references are rewritten first), writes ``.gz`` (and
+``.br`` when the optional ``brotli`` package is installed) next to text
+assets, and records the mapping in ``static/dist/manifest.json``.
+
+``init_assets(app)`` makes ``url_for('static', filename=...)`` return the
+fingerprinted name when the manifest has one, serves ``dist/`` files with
+``immutable`` caching (picking a precompressed variant from
+Accept-Encoding), and gzips HTML/JSON responses on the fly.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+import click
+from flask import Blueprint, current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+assets_bp = Blueprint("assets", __name__, cli_group=None)
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+ONE_YEAR = 365 * 24 * 3600
+PRECOMPRESS_EXTS = {".css", ".js", ".svg", ".json", ".txt"}
+DYNAMIC_COMPRESS_TYPES = {"text/html", "application/json"}
+MIN_COMPRESS_SIZE = 500
+
+_DECLARATIONS = re.compile(r"\{[^{}]*\}")
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)/static/([^'")]+)\1\s*\)""")
+
+
+def minify_css(text):
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    # ':' only inside declaration blocks; in selectors ".a :hover" != ".a:hover"
+    text = _DECLARATIONS.sub(lambda m: re.sub(r"\s*:\s*", ":", m.group(0)), text)
+    return text.replace(";}", "}").strip()
+
+
+def _fingerprint(rel_path, data):
+    stem, ext = os.path.splitext(rel_path)
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    return f"{DIST}/{stem}.{digest}{ext}".replace(os.sep, "/")
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def build(static_folder):
+    """Build ``static/dist``; returns the manifest dict."""
+    sources = []
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if not (root == static_folder and d == DIST)]
+        for name in files:
+            rel = os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, "/")
+            sources.append(rel)
+
+    # Non-CSS first so CSS can point at the fingerprinted images/fonts
+    sources.sort(key=lambda rel: rel.endswith(".css"))
+    manifest = {}
+    for rel in sources:
+        with open(os.path.join(static_folder, rel), "rb") as f:
+            data = f.read()
+        if rel.endswith(".css"):
+            text = _CSS_URL.sub(lambda m: f"url(/static/{manifest.get(m.group(2), m.group(2))})", data.decode("utf-8"))
+            data = minify_css(text).encode("utf-8")
+
+        out = _fingerprint(rel, data)
+        manifest[rel] = out
+        out_path = os.path.join(static_folder, out)
+        _write(out_path, data)
+        if os.path.splitext(rel)[1] in PRECOMPRESS_EXTS:
+            _write(out_path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                _write(out_path + ".br", brotli.compress(data))
+
+    _write(os.path.join(static_folder, DIST, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def init_assets(app):
+    manifest = load_manifest(app.static_folder)
+    app.extensions["asset_manifest"] = manifest
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == "static" and values.get("filename") in manifest:
+            values["filename"] = manifest[values["filename"]]
+
+    def serve_static(filename):
+        if not filename.startswith(DIST + "/"):
+            return app.send_static_file(filename)
+
+        accept = request.headers.get("Accept-Encoding", "")
+        mimetype = mimetypes.guess_type(filename)[0]
+        resp = None
+        for encoding, ext in (("br", ".br"), ("gzip", ".gz")):
+            if encoding in accept and os.path.exists(os.path.join(app.static_folder, filename + ext)):
+                resp = send_from_directory(app.static_folder, filename + ext, mimetype=mimetype, max_age=ONE_YEAR)
+                resp.headers["Content-Encoding"] = encoding
+                break
+        if resp is None:
+            resp = send_from_directory(app.static_folder, filename, max_age=ONE_YEAR)
+        resp.headers["Cache-Control"] = f"public, max-age={ONE_YEAR}, immutable"
+        resp.vary.add("Accept-Encoding")
+        return resp
+
+    app.view_functions["static"] = serve_static
+
+    @app.after_request
+    def compress_response(resp):
+        if (resp.direct_passthrough or resp.is_streamed
+                or resp.status_code < 200 or resp.status_code in (204, 304)
+                or "Content-Encoding" in resp.headers
+                or resp.mimetype not in DYNAMIC_COMPRESS_TYPES
+                or "gzip" not in request.headers.get("Accept-Encoding", "")):
+            return resp
+        data = resp.get_data()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return resp
+        resp.set_data(gzip.compress(data, compresslevel=6))
+        resp.headers["Content-Encoding"] = "gzip"
+        resp.vary.add("Accept-Encoding")
+        return resp
+
+
+@assets_bp.cli.command("build-assets")
+def build_assets_command():
+    """Fingerprint, minify and precompress static assets into static/dist."""
+    manifest = build(current_app.static_folder)
+    click.echo(f"Built {len(manifest)} asset(s) into {os.path.join(current_app.static_folder, DIST)}")
@@ -19,7 +19,7 @@ def login_required(f):
 def public_user(user_doc):
     """Return safe fields only."""
     return {
-        "id": str(user_doc["_id"]),
+        "id": user_doc["_id"],
         "email": user_doc["email"],
         "name": user_doc.get("name", "")
     }
@@ -0,0 +1,73 @@
+# bench_json.py
+"""Microbenchmark: cost of serializing 1k task documents for an API response.
+
+    python bench_json.py
+
+"before" is the old path: copy + stringify ids field by field (as
+models.to_doc_id / the hand-built dicts did), then stdlib json with
+str() as the fallback. "after" is json_provider.dumps on the raw
+documents (orjson if installed, else stdlib with the ObjectId/datetime hook).
+"""
+import json
+import timeit
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import json_provider
+
+N_TASKS = 1000
+REPEAT = 5
+NUMBER = 20
+
+
+def make_tasks(n=N_TASKS):
+    uid = ObjectId()
+    cat = ObjectId()
+    now = datetime.utcnow()
+    return [{
+        "_id": ObjectId(),
+        "user_id": uid,
+        "title": f"Task number {i}",
+        "category_id": cat,
+        "priority": i % 3 + 1,
+        "status": "todo",
+        "due_date": now + timedelta(days=i % 30),
+        "description": "Some longer description text " * 3,
+        "tags": ["work", "urgent"] if i % 2 else ["home"],
+        "created_at": now,
+        "updated_at": now,
+    } for i in range(n)]
+
+
+def before(tasks):
+    out = []
+    for t in tasks:
+        d = dict(t)
+        d["id"] = str(d.pop("_id"))
+        if isinstance(d.get("user_id"), ObjectId):
+            d["user_id"] = str(d["user_id"])
+        if isinstance(d.get("category_id"), ObjectId):
+            d["category_id"] = str(d["category_id"])
+        out.append(d)
+    return json.dumps(out, default=str, separators=(",", ":"))
+
+
+def after(tasks):
+    return json_provider.dumps(tasks)
+
+
+def main():
+    tasks = make_tasks()
+    backend = "orjson" if json_provider.orjson is not None else "stdlib json"
+    print(f"{N_TASKS} tasks, best of {REPEAT} x {NUMBER} runs, backend: {backend}")
+    results = {}
+    for name, fn in (("before", before), ("after", after)):
+        best = min(timeit.repeat(lambda: fn(tasks), repeat=REPEAT, number=NUMBER)) / NUMBER
+        results[name] = best
+        print(f"  {name:6s} {best * 1000:8.3f} ms per 1k tasks")
+    print(f"  speedup {results['before'] / results['after']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
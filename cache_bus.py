@@ -0,0 +1,162 @@
+# cache_bus.py
+"""Cross-worker cache invalidation.
+
+Each worker keeps a per-user version number. Writing code calls
+``bump(uid)``; the bump is applied locally at once and broadcast on the bus
+so every other worker bumps its copy too. Caches store the version they were
+filled at (``VersionedCache``) and treat any other version as a miss, so a
+write on one worker invalidates that user's entries everywhere.
+
+Buses:
+  * ``LocalBus``  - in-process only (single worker, tests).
+  * ``CappedCollectionBus`` - inserts into a capped Mongo collection and
+    tails it from a daemon thread in each worker.
+
+Pick one with ``CACHE_BUS=capped|local`` (default ``capped``; ``local`` is
+only safe with a single worker). Entries also expire after a TTL, which
+bounds staleness if a broadcast is ever missed.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from config import settings
+from db import db
+
+
+class LocalBus:
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, fn):
+        self._subscribers.append(fn)
+
+    def ensure_listener(self):
+        pass
+
+    def publish(self, uid):
+        for fn in self._subscribers:
+            fn(uid)
+
+
+class CappedCollectionBus:
+    """Pub/sub over a tailable cursor on a capped collection."""
+
+    def __init__(self, collection_name="cache_events", size_bytes=1024 * 1024):
+        self.name = collection_name
+        self.size_bytes = size_bytes
+        self.origin = ObjectId()  # skip our own events; they were applied locally
+        self._subscribers = []
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_collection(self):
+        try:
+            db.create_collection(self.name, capped=True, size=self.size_bytes)
+            # a tailable cursor on an empty capped collection dies immediately
+            db[self.name].insert_one({"seed": True, "ts": datetime.utcnow()})
+        except CollectionInvalid:
+            pass
+
+    def ensure_listener(self):
+        # started lazily so each forked worker gets its own thread
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._listen, name="cache-bus", daemon=True)
+            self._thread.start()
+
+    def _listen(self):
+        coll = db[self.name]
+        last_id = ObjectId.from_datetime(datetime.utcnow())
+        while True:
+            try:
+                self._ensure_collection()
+                cur = coll.find({"_id": {"$gt": last_id}}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cur.alive:
+                    for event in cur:
+                        last_id = event["_id"]
+                        if event.get("origin") != self.origin and "uid" in event:
+                            for fn in self._subscribers:
+                                fn(event["uid"])
+            except PyMongoError as e:
+                print("[cache bus]", type(e).__name__, str(e))
+            time.sleep(1)
+
+    def subscribe(self, fn):
+        self._subscribers.append(fn)
+
+    def publish(self, uid):
+        self.ensure_listener()
+        db[self.name].insert_one({"uid": uid, "origin": self.origin, "ts": datetime.utcnow()})
+
+
+class UserVersions:
+    def __init__(self, bus):
+        self.bus = bus
+        self._versions = {}
+        self._lock = threading.Lock()
+        bus.subscribe(self._apply)
+
+    def _apply(self, uid):
+        with self._lock:
+            self._versions[uid] = self._versions.get(uid, 0) + 1
+
+    def version(self, uid):
+        self.bus.ensure_listener()
+        return self._versions.get(uid, 0)
+
+    def bump(self, uid):
+        uid = str(uid)
+        self._apply(uid)
+        self.bus.publish(uid)
+
+
+class VersionedCache:
+    """Small LRU of per-user values, valid only while the user's version is unchanged."""
+
+    def __init__(self, versions, maxsize=1024, ttl=30):
+        self.versions = versions
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_set(self, uid, key, loader):
+        uid = str(uid)
+        version = self.versions.version(uid)
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get((uid, key))
+            if hit and hit[0] == version and hit[1] > now:
+                self._data.move_to_end((uid, key))
+                return hit[2]
+        value = loader()
+        with self._lock:
+            self._data[(uid, key)] = (version, now + self.ttl, value)
+            self._data.move_to_end((uid, key))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+
+def _make_bus():
+    return LocalBus() if settings.CACHE_BUS == "local" else CappedCollectionBus()
+
+
+versions = UserVersions(_make_bus())
+
+
+def bump(uid):
+    """Invalidate every cached entry for ``uid`` on all workers."""
+    versions.bump(uid)
@@ -0,0 +1,85 @@
+# calendar_view.py
+"""Calendar month / week endpoints.
+
+Each request is a single ``$group``-by-day aggregation over the
+``(user_id, due_date)`` index, returning tasks bucketed per due date. Results
+are cached per user and date range in a ``VersionedCache``, so any task
+write by that user (which bumps their version through ``cache_bus``) drops
+the cached months on every worker. The cache is shared by all of the user's
+sessions, so it is only ever filled from the primary, never through
+``read_db()``.
+"""
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from flask import Blueprint, jsonify, request, session
+
+import cache_bus
+from auth import login_required
+from db import db
+
+calendar_bp = Blueprint("calendar", __name__, url_prefix="/api/calendar")
+
+_cache = cache_bus.VersionedCache(cache_bus.versions, maxsize=2048, ttl=300)
+
+
+def day_buckets(uid, start, end):
+    """{"YYYY-MM-DD": {"count": n, "tasks": [...]}} for tasks due in [start, end)."""
+    pipeline = [
+        {"$match": {"user_id": uid, "due_date": {"$gte": start, "$lt": end}}},
+        {"$sort": {"due_date": 1, "priority": 1}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$due_date"}},
+            "count": {"$sum": 1},
+            "tasks": {"$push": {
+                "id": "$_id",
+                "title": "$title",
+                "status": "$status",
+                "priority": "$priority",
+                "tags": "$tags",
+            }},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+    return {d["_id"]: {"count": d["count"], "tasks": d["tasks"]} for d in db.tasks.aggregate(pipeline)}
+
+
+def cached_buckets(uid, start, end):
+    key = ("calendar", start.date().isoformat(), end.date().isoformat())
+    return _cache.get_or_set(uid, key, lambda: day_buckets(uid, start, end))
+
+
+@calendar_bp.get("/month")
+@login_required
+def month():
+    today = datetime.utcnow()
+    year = request.args.get("year", default=today.year, type=int)
+    month = request.args.get("month", default=today.month, type=int)
+    try:
+        start = datetime(year, month, 1)
+        end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    except ValueError:  # includes December 9999, whose end is out of range
+        return jsonify({"error": "invalid year/month"}), 400
+    days = cached_buckets(ObjectId(session["user_id"]), start, end)
+    return jsonify({"year": year, "month": month, "days": days}), 200
+
+
+@calendar_bp.get("/week")
+@login_required
+def week():
+    start_str = request.args.get("start")
+    if start_str:
+        try:
+            start = datetime.strptime(start_str, "%Y-%m-%d")
+        except ValueError:
+            return jsonify({"error": "start must be YYYY-MM-DD"}), 400
+    else:
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        start = today - timedelta(days=today.weekday())  # Monday
+    try:
+        end = start + timedelta(days=7)
+    except OverflowError:
+        return jsonify({"error": "start is out of range"}), 400
+
+    days = cached_buckets(ObjectId(session["user_id"]), start, end)
+    return jsonify({"start": start.date().isoformat(), "end": end.date().isoformat(), "days": days}), 200
@@ -12,6 +12,24 @@ class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY", "dev")
     PORT: int = int(os.getenv("PORT", "5000"))
     DEBUG: bool = os.getenv("FLASK_ENV") == "development"
+    ARCHIVE_AFTER_DAYS: int = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+    ARCHIVE_COMPRESS: bool = os.getenv("ARCHIVE_COMPRESS", "0") == "1"
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+    RATE_LIMIT_STORE: str = os.getenv("RATE_LIMIT_STORE", "memory")  # memory | mongo
+    TRUSTED_PROXIES: int = int(os.getenv("TRUSTED_PROXIES", "0"))  # reverse proxies in front of the app
+    DB_QUEUE_SHED_THRESHOLD: int = int(os.getenv("DB_QUEUE_SHED_THRESHOLD", "50"))
+    CACHE_BUS: str = os.getenv("CACHE_BUS", "capped")  # capped | local
+    HEALTH_INTERVAL: float = float(os.getenv("HEALTH_INTERVAL", "5"))
+    HEALTH_MAX_LATENCY_MS: float = float(os.getenv("HEALTH_MAX_LATENCY_MS", "500"))
+    HEALTH_MAX_ERROR_RATE: float = float(os.getenv("HEALTH_MAX_ERROR_RATE", "0.2"))
+    MONGO_TLS: bool = os.getenv("MONGO_TLS", "1") == "1"
+    READ_MAX_STALENESS: int = int(os.getenv("READ_MAX_STALENESS", "90"))  # seconds; MongoDB minimum is 90
+    READ_YOUR_WRITES_SECONDS: int = int(os.getenv("READ_YOUR_WRITES_SECONDS", "120"))
+
+    def __post_init__(self):
+        # pymongo only rejects this when selecting a server, i.e. on every secondary read
+        if self.READ_MAX_STALENESS < 90:
+            raise ValueError(f"READ_MAX_STALENESS must be at least 90 seconds, got {self.READ_MAX_STALENESS}")
 
 
 settings = Settings()
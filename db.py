@@ -1,19 +1,92 @@
 import os
-from pymongo import MongoClient
+import threading
+from pymongo import MongoClient, monitoring
+from pymongo.read_preferences import SecondaryPreferred
 from dotenv import load_dotenv
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 import certifi, os
 
+from config import settings
+
 load_dotenv()
 
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Counts threads waiting for a pooled connection (used for load shedding)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.checked_out = 0
+
+    def _add(self, field, n):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def connection_check_out_started(self, event):
+        self._add("waiting", 1)
+
+    def connection_checked_out(self, event):
+        self._add("waiting", -1)
+        self._add("checked_out", 1)
+
+    def connection_check_out_failed(self, event):
+        self._add("waiting", -1)
+
+    def connection_checked_in(self, event):
+        self._add("checked_out", -1)
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_created(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+
+
+class CommandStats(monitoring.CommandListener):
+    """Running totals of succeeded / failed commands (sampled by health.py)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ok_count = 0
+        self.error_count = 0
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        with self._lock:
+            self.ok_count += 1
+
+    def failed(self, event):
+        with self._lock:
+            self.error_count += 1
+
+
+pool_stats = PoolStats()
+command_stats = CommandStats()
+
+_tls = settings.MONGO_TLS
 client = MongoClient(
     os.getenv("MONGO_URI", "mongodb://localhost:27017"),
-    tls=True,
-    tlsCAFile=certifi.where(),
-    serverSelectionTimeoutMS=5000
+    tls=_tls,
+    tlsCAFile=certifi.where() if _tls else None,
+    serverSelectionTimeoutMS=5000,
+    event_listeners=[pool_stats, command_stats],
 )
 db = client[os.getenv("MONGO_DB", "todoapp")]
 
+# Same database, but reads may go to a secondary that is at most
+# READ_MAX_STALENESS seconds behind (MongoDB requires >= 90). Only use it for
+# queries that tolerate that, and never to fill a shared cache; see
+# read_routing.read_db() for read-your-own-writes.
+secondary_db = client.get_database(
+    os.getenv("MONGO_DB", "todoapp"),
+    read_preference=SecondaryPreferred(max_staleness=settings.READ_MAX_STALENESS),
+)
+
 
 def ping():
     try:
@@ -22,3 +95,23 @@ def ping():
     except (ConnectionFailure, ServerSelectionTimeoutError) as e:
         print("[mongo ping failed]", type(e).__name__, str(e))
         return False
+
+
+def ensure_indexes():
+    """Create the indexes the dashboard and history queries rely on (idempotent)."""
+    db.tasks.create_index([("user_id", 1), ("status", 1), ("updated_at", -1)])
+    # multikey: one entry per tag, so tag filters stay index-backed
+    db.tasks.create_index([("user_id", 1), ("tags", 1), ("status", 1)])
+    # matches SORTS["smart"] key for key, so sort=smart&limit=N reads the top N in index order
+    db.tasks.create_index([("user_id", 1), ("urgency", -1), ("due_date", 1)])
+    if "user_id_1_urgency_-1" in db.tasks.index_information():
+        db.tasks.drop_index("user_id_1_urgency_-1")  # prefix of the index above
+    db.tasks.create_index([("user_id", 1), ("due_date", 1)])
+    # archive.archive_completed_tasks scans done tasks across all users
+    db.tasks.create_index([("status", 1), ("updated_at", 1)])
+    db.tasks_archive.create_index([("user_id", 1), ("status", 1), ("updated_at", -1)])
+    # $merge target key for archive.rebuild_summary
+    db.tasks_archive_summary.create_index([("user_id", 1), ("month", 1)], unique=True)
+    db.categories.create_index([("user_id", 1), ("name", 1)])
+    db.smart_lists.create_index([("user_id", 1), ("name", 1)], unique=True)
+    db.rate_limits.create_index("ts", expireAfterSeconds=3600)
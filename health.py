@@ -0,0 +1,116 @@
+# health.py
+"""Background DB health monitor and cheap liveness / readiness probes.
+
+A daemon thread per worker pings MongoDB every ``HEALTH_INTERVAL`` seconds
+and records latency, connection-pool usage and the command error rate since
+the previous sample. The probe endpoints only read that cached snapshot, so
+a slow or unreachable database never ties up a worker on a probe.
+
+  * ``/healthz`` - liveness: the process is up and serving (always 200).
+  * ``/readyz``  - readiness: 200 while the last sample is within
+    thresholds, 503 otherwise (with the reasons).
+"""
+import os
+import threading
+import time
+
+from flask import Blueprint, jsonify
+
+from config import settings
+from db import client, command_stats, pool_stats, ping
+
+health_bp = Blueprint("health", __name__)
+
+
+class HealthMonitor:
+    def __init__(self, interval=settings.HEALTH_INTERVAL):
+        self.interval = interval
+        self.state = {"db": "unknown", "ready": False, "reasons": ["no sample yet"], "checked_at": None}
+        self._last_counts = (0, 0)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # lazily, so each forked worker runs its own sampler
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:  # never let the sampler die
+                print("[health monitor]", type(e).__name__, str(e))
+            time.sleep(self.interval)
+
+    def sample(self):
+        started = time.monotonic()
+        db_ok = ping()
+        latency_ms = (time.monotonic() - started) * 1000
+
+        ok, errors = command_stats.ok_count, command_stats.error_count
+        prev_ok, prev_errors = self._last_counts
+        self._last_counts = (ok, errors)
+        total = (ok - prev_ok) + (errors - prev_errors)
+        error_rate = (errors - prev_errors) / total if total else 0.0
+
+        max_pool = client.options.pool_options.max_pool_size or 0
+        pool = {
+            "checked_out": pool_stats.checked_out,
+            "waiting": pool_stats.waiting,
+            "max_size": max_pool,
+            "saturation": round(pool_stats.checked_out / max_pool, 3) if max_pool else None,
+        }
+
+        reasons = []
+        if not db_ok:
+            reasons.append("db ping failed")
+        elif latency_ms > settings.HEALTH_MAX_LATENCY_MS:
+            reasons.append(f"db latency {latency_ms:.0f}ms > {settings.HEALTH_MAX_LATENCY_MS:.0f}ms")
+        if error_rate > settings.HEALTH_MAX_ERROR_RATE:
+            reasons.append(f"db error rate {error_rate:.0%} > {settings.HEALTH_MAX_ERROR_RATE:.0%}")
+        if pool["waiting"] > settings.DB_QUEUE_SHED_THRESHOLD:
+            reasons.append(f"{pool['waiting']} requests waiting for a db connection")
+
+        self.state = {
+            "db": "ok" if db_ok else "down",
+            "latency_ms": round(latency_ms, 1),
+            "error_rate": round(error_rate, 3),
+            "pool": pool,
+            "ready": not reasons,
+            "reasons": reasons,
+            "checked_at": time.time(),
+        }
+        return self.state
+
+    def snapshot(self):
+        """Latest sample; not ready if the sampler has fallen behind."""
+        self.ensure_started()
+        state = dict(self.state)
+        checked_at = state.get("checked_at")
+        if checked_at and time.time() - checked_at > 3 * self.interval + 5:
+            state["ready"] = False
+            state["reasons"] = state.get("reasons", []) + ["health sample is stale"]
+        return state
+
+
+monitor = HealthMonitor()
+
+
+@health_bp.get("/healthz")
+def liveness():
+    monitor.ensure_started()
+    return jsonify({"status": "ok"}), 200
+
+
+@health_bp.get("/readyz")
+def readiness():
+    state = monitor.snapshot()
+    return jsonify(state), 200 if state["ready"] else 503
@@ -0,0 +1,72 @@
+# json_provider.py
+"""JSON encoding for the API.
+
+``FastJSONProvider`` replaces Flask's default provider, so ``jsonify`` and
+``return {...}`` both go through it. It encodes ``ObjectId`` as its hex
+string and ``datetime`` / ``date`` as ISO 8601, so routes can return Mongo
+documents without converting fields by hand. ``orjson`` is used when it is
+installed, otherwise the stdlib ``json`` module.
+
+``stream_json_array`` sends a large result set as a JSON array one element
+at a time instead of building the whole body in memory.
+"""
+import json
+from datetime import date, datetime
+
+from bson import ObjectId
+from flask import Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+
+def default(o):
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, (set, frozenset, tuple)):
+        return list(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def dumps(obj, indent=False):
+    """Encode ``obj`` to a str."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=default, option=option).decode("utf-8")
+    return json.dumps(obj, default=default, ensure_ascii=False,
+                      indent=2 if indent else None, separators=None if indent else (",", ":"))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and set(kwargs) <= {"indent", "separators"}:
+            return dumps(obj, indent=bool(kwargs.get("indent")))
+        kwargs.setdefault("default", default)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+
+def stream_json_array(items, transform=None):
+    """Stream an iterable (e.g. a Mongo cursor) as a JSON array response."""
+    def generate():
+        yield "["
+        first = True
+        for item in items:
+            if transform is not None:
+                item = transform(item)
+            yield ("" if first else ",") + dumps(item)
+            first = False
+        yield "]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
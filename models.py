@@ -1,4 +1,4 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Literal
 from datetime import datetime, timezone
 from bson import ObjectId
 from bson.errors import InvalidId
@@ -26,14 +26,10 @@ def parse_oid(s: str) -> ObjectId:
         raise ValueError("invalid id")
 
 def to_doc_id(doc: Dict[str, Any]) -> Dict[str, Any]:
-    """_id -> id（返回给前端用）"""
+    """_id -> id（返回给前端用）. ObjectId/datetime values are left as-is; the app's JSON provider encodes them."""
     if not doc:
         return doc
-    doc["id"] = str(doc.pop("_id"))
-    if "user_id" in doc and isinstance(doc["user_id"], ObjectId):
-        doc["user_id"] = str(doc["user_id"])
-    if "category_id" in doc and isinstance(doc["category_id"], ObjectId):
-        doc["category_id"] = str(doc["category_id"])
+    doc["id"] = doc.pop("_id")
     return doc
 
 class UserLogin(BaseModel):
@@ -43,8 +39,9 @@ class UserLogin(BaseModel):
 class TaskIn(BaseModel):
     title: str = Field(min_length=1, max_length=200)
     category_id: Optional[str] = None
-    priority: str = Field(default="low")   
-    status: str = Field(default="todo") 
+    priority: Literal["high", "medium", "low"] = "low"
+    status: Literal["todo", "in-progress", "done"] = "todo"
+    due_date: Optional[datetime] = None
     description: Optional[str] = None
 
 def new_task_doc(user_id: str, payload: TaskIn) -> Dict[str, Any]:
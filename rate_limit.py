@@ -0,0 +1,135 @@
+# rate_limit.py
+"""Token-bucket rate limiting and DB-queue load shedding.
+
+Budgets are per rule (see ``RULES``) and per client: the logged-in user id,
+or the remote address for anonymous requests (taken from X-Forwarded-For
+when ``TRUSTED_PROXIES`` is set, see app.py). Bucket state lives in a store:
+``MemoryStore`` for a single process, ``MongoStore`` when several workers
+must share one budget. Both expose ``take(key, rate, burst) -> (allowed,
+retry_after_seconds)``.
+"""
+import math
+import threading
+import time
+from datetime import datetime
+
+from flask import request, session, jsonify
+from pymongo import ReturnDocument
+
+from config import settings
+from db import db, pool_stats
+
+# (name, methods, path prefix, tokens per second, burst)
+RULES = [
+    ("auth", {"POST"}, "/api/auth/", 10 / 60, 5),
+    ("login", {"POST"}, "/login", 10 / 60, 5),
+    ("forgot", {"POST"}, "/forgot", 5 / 60, 3),
+    ("import", {"POST"}, "/api/tasks/import", 2 / 60, 2),
+    ("tasks", {"GET", "POST"}, "/api/tasks", 2, 30),
+    ("categories", {"GET", "POST"}, "/api/categories", 1, 10),
+]
+
+SHED_EXEMPT_PREFIXES = ("/static/", "/test", "/healthz", "/readyz")
+
+
+class MemoryStore:
+    """In-process buckets; fine for one worker or for tests."""
+
+    PRUNE_EVERY = 60  # seconds
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._next_prune = time.monotonic() + self.PRUNE_EVERY
+
+    def _prune(self, now):
+        # an idle bucket that has refilled completely is the same as no bucket
+        idle = [k for k, (_, last, full_after) in self._buckets.items() if now - last >= full_after]
+        for key in idle:
+            del self._buckets[key]
+        self._next_prune = now + self.PRUNE_EVERY
+
+    def take(self, key, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_prune:
+                self._prune(now)
+            tokens, last, _ = self._buckets.get(key, (burst, now, 0))
+            tokens = min(burst, tokens + (now - last) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, (burst - tokens) / rate)
+        return allowed, 0 if allowed else math.ceil((1 - tokens) / rate)
+
+
+class MongoStore:
+    """Buckets shared by every worker, refilled and debited in one atomic update."""
+
+    def __init__(self, collection=None):
+        self.coll = collection if collection is not None else db.rate_limits
+
+    def take(self, key, rate, burst):
+        now = datetime.utcnow()
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$ts", now]}]}, 1000]}
+        refilled = {"$min": [burst, {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, rate]}]}]}
+        doc = self.coll.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "ts": now}},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc["allowed"]:
+            return True, 0
+        return False, math.ceil((1 - doc["tokens"]) / rate)
+
+
+def _match_rule(method, path):
+    for name, methods, prefix, rate, burst in RULES:
+        if method in methods and path.startswith(prefix):
+            return name, rate, burst
+    return None
+
+
+def _client_key():
+    return session.get("user_id") or request.remote_addr or "unknown"
+
+
+def _too_busy(status, message, retry_after):
+    if request.path.startswith("/api/") or request.is_json:
+        resp = jsonify({"error": message})
+    else:
+        resp = message
+    return resp, status, {"Retry-After": str(retry_after)}
+
+
+def init_rate_limiter(app, store=None):
+    """Install the limiter so it runs before every other before_request hook."""
+    if store is None:
+        store = MongoStore() if settings.RATE_LIMIT_STORE == "mongo" else MemoryStore()
+    app.extensions["rate_limit_store"] = store
+
+    def check_limits():
+        if not app.config.get("RATE_LIMIT_ENABLED", True):
+            return None
+        if request.path.startswith(SHED_EXEMPT_PREFIXES):
+            return None
+
+        # Shed load before doing any DB work if requests are already queueing for connections
+        if pool_stats.waiting > app.config.get("DB_QUEUE_SHED_THRESHOLD", 50):
+            return _too_busy(503, "server busy, try again shortly", 1)
+
+        rule = _match_rule(request.method, request.path)
+        if rule is None:
+            return None
+        name, rate, burst = rule
+        allowed, retry_after = store.take(f"{name}:{_client_key()}", rate, burst)
+        if not allowed:
+            return _too_busy(429, "too many requests", retry_after)
+        return None
+
+    app.before_request_funcs.setdefault(None, []).insert(0, check_limits)
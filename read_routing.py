@@ -0,0 +1,35 @@
+# read_routing.py
+"""Send staleness-tolerant reads to secondaries, except right after a write.
+
+Views that can live with data a few seconds old (history, facet counts,
+task listing) read through ``read_db()``. Data that goes into a shared
+per-user cache is loaded from the primary instead, since a stale copy
+there would be served to every session. ``read_db()`` returns
+``db.secondary_db`` unless the current session wrote something in the last
+``READ_YOUR_WRITES_SECONDS``; then it returns the primary so the user sees
+their own change (e.g. the dashboard right after ``complete_task()``
+redirects). Writes are detected generically: any successful
+POST/PUT/PATCH/DELETE by a logged-in user.
+"""
+import time
+
+from flask import has_request_context, request, session
+
+from config import settings
+from db import db, secondary_db
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def read_db():
+    if has_request_context() and session.get("_rw_until", 0) > time.time():
+        return db
+    return secondary_db
+
+
+def init_read_routing(app):
+    @app.after_request
+    def remember_write(resp):
+        if request.method in WRITE_METHODS and resp.status_code < 400 and "user_id" in session:
+            session["_rw_until"] = time.time() + settings.READ_YOUR_WRITES_SECONDS
+        return resp
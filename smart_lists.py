@@ -0,0 +1,134 @@
+# smart_lists.py
+"""Saved dashboard views ("smart lists") with materialized results.
+
+Each list stores its filter args and sort, plus ``entries``: the matching
+task ids in display order, each carrying the sort-key fields. Opening a list
+is one read of that array and one ``_id $in`` fetch. When a task is written,
+``sync_task`` re-checks it against each of the owner's lists and moves it in
+or out with ``$pull`` / ``$push`` + ``$sort``, so lists never need a full
+re-query unless ``refresh_user`` is called (bulk writes).
+"""
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from db import db
+from task_filters import build_task_query, sort_spec, SORTS
+
+FILTER_KEYS = ("category", "search", "tags", "tag_mode", "priority", "due_from", "due_to", "status")
+
+
+def _filters_from_args(args):
+    filters = {}
+    for key in FILTER_KEYS:
+        value = args.get(key)
+        if value:
+            filters[key] = value
+    return filters
+
+
+def _sort_fields(sort):
+    return [field for field, _ in sort_spec(sort)]
+
+
+def _entry(task, sort):
+    entry = {"_id": task["_id"]}
+    for field in _sort_fields(sort):
+        entry[field] = task.get(field)
+    return entry
+
+
+def _query(lst):
+    cats = ()
+    if lst["filters"].get("category") and not ObjectId.is_valid(lst["filters"]["category"]):
+        cats = list(db.categories.find({"user_id": lst["user_id"]}, {"name": 1}))
+    return build_task_query(lst["user_id"], lst["filters"], cats)
+
+
+def materialize(lst):
+    """Recompute a list's entries from scratch."""
+    sort = lst.get("sort", "default")
+    projection = {f: 1 for f in _sort_fields(sort)}
+    cur = db.tasks.find(_query(lst), projection).sort(sort_spec(sort))
+    entries = [_entry(t, sort) for t in cur]
+    db.smart_lists.update_one(
+        {"_id": lst["_id"]},
+        {"$set": {"entries": entries, "refreshed_at": datetime.utcnow()}},
+    )
+    return entries
+
+
+def save(uid, name, args):
+    """Create (or overwrite, by name) a smart list from dashboard query args."""
+    sort = args.get("sort") if args.get("sort") in SORTS else "default"
+    lst = db.smart_lists.find_one_and_update(
+        {"user_id": uid, "name": name},
+        {"$set": {"filters": _filters_from_args(args), "sort": sort, "updated_at": datetime.utcnow()},
+         "$setOnInsert": {"user_id": uid, "name": name, "entries": []}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+        projection={"entries": 0},
+    )
+    materialize(lst)
+    return lst
+
+
+def list_for_user(uid):
+    return [
+        {"id": str(lst["_id"]), "name": lst["name"], "count": lst.get("count", 0)}
+        for lst in db.smart_lists.aggregate([
+            {"$match": {"user_id": uid}},
+            {"$project": {"name": 1, "count": {"$size": {"$ifNull": ["$entries", []]}}}},
+            {"$sort": {"name": 1}},
+        ])
+    ]
+
+
+def get(uid, list_id):
+    if not ObjectId.is_valid(list_id):
+        return None
+    return db.smart_lists.find_one({"_id": ObjectId(list_id), "user_id": uid})
+
+
+def delete(uid, list_id):
+    if ObjectId.is_valid(list_id):
+        db.smart_lists.delete_one({"_id": ObjectId(list_id), "user_id": uid})
+
+
+def load_tasks(lst):
+    """The list's tasks, in the stored order."""
+    ids = [e["_id"] for e in lst.get("entries", [])]
+    if not ids:
+        return []
+    by_id = {t["_id"]: t for t in db.tasks.find({"_id": {"$in": ids}, "user_id": lst["user_id"]})}
+    # ids can be missing if a task was archived; just skip them
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def sync_task(uid, task_id):
+    """Move one task in/out of each of the user's lists after it was written or deleted."""
+    for lst in db.smart_lists.find({"user_id": uid}, {"entries": 0}):
+        sort = lst.get("sort", "default")
+        projection = {f: 1 for f in _sort_fields(sort)}
+        task = db.tasks.find_one({"$and": [_query(lst), {"_id": task_id}]}, projection)
+
+        db.smart_lists.update_one({"_id": lst["_id"]}, {"$pull": {"entries": {"_id": task_id}}})
+        if task:
+            # guarded so two concurrent syncs (pull, pull, push, push) can't add it twice
+            db.smart_lists.update_one(
+                {"_id": lst["_id"], "entries._id": {"$ne": task_id}},
+                {"$push": {"entries": {
+                    "$each": [_entry(task, sort)],
+                    "$sort": dict(sort_spec(sort)),
+                }}},
+            )
+
+
+def refresh_user(uid, sort=None):
+    """Re-materialize every list for a user (after bulk writes), or only those using ``sort``."""
+    q = {"user_id": uid}
+    if sort:
+        q["sort"] = sort
+    for lst in db.smart_lists.find(q, {"entries": 0}):
+        materialize(lst)
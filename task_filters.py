@@ -0,0 +1,146 @@
+# task_filters.py
+"""Dashboard filtering: query string -> Mongo query, sort spec and facet counts.
+
+Everything here is keyed on ``user_id`` first so the compound indexes created
+in ``db.ensure_indexes`` (notably the multikey ``(user_id, tags, status)``)
+can serve the match.
+"""
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from db import db
+
+PRIORITY_MAP = {"high": 1, "medium": 2, "low": 3}
+
+SORTS = {
+    # priority (1=high first) then closer due dates
+    "priority": [("priority", 1), ("due_date", 1)],
+    # closer due dates first, then priority
+    "due_date": [("due_date", 1), ("priority", 1)],
+    # stored urgency score (see urgency.py), served from the (user_id, urgency, due_date) index
+    "smart": [("urgency", -1), ("due_date", 1)],
+    "default": [("updated_at", -1)],
+}
+
+
+def parse_tags(value):
+    """'Work, urgent' / ['work', 'Urgent'] -> ['work', 'urgent'] (lowercased, deduped, order kept).
+
+    Raises ValueError for anything else (numbers, objects, nested lists), as
+    JSON bodies and NDJSON imports can carry any type.
+    """
+    if value is None or value == "" or value == []:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    elif not isinstance(value, list):
+        raise ValueError("tags must be a string or a list")
+    tags = []
+    for t in value:
+        if isinstance(t, bool) or not isinstance(t, (str, int, float)):
+            raise ValueError(f"invalid tag: {t!r}")
+        t = str(t).strip().lower()
+        if t and t not in tags:
+            tags.append(t)
+    return tags
+
+
+def _arg_list(args, name):
+    """Support both ?tags=a,b and ?tags=a&tags=b."""
+    if hasattr(args, "getlist"):
+        raw = args.getlist(name)
+    else:
+        raw = args.get(name) or []
+        raw = [raw] if isinstance(raw, str) else list(raw)
+    return parse_tags(",".join(raw))
+
+
+def _parse_day(s):
+    try:
+        return datetime.strptime(s, "%Y-%m-%d") if s else None
+    except ValueError:
+        return None
+
+
+def build_task_query(uid, args, cats=()):
+    """Translate dashboard query args into a Mongo filter for ``uid``'s tasks.
+
+    Supported args: category, search, tags (+ tag_mode=any|all), priority
+    (one or more of high/medium/low), due_from / due_to (YYYY-MM-DD,
+    inclusive) and status (defaults to everything except done; ``all``
+    disables the status filter).
+    """
+    q = {"user_id": uid} if uid else {}
+
+    status = (args.get("status") or "").strip().lower()
+    if status == "all":
+        pass
+    elif status:
+        q["status"] = status
+    else:
+        # Completed tasks only show up in history
+        q["status"] = {"$ne": "done"}
+
+    category = args.get("category", "all")
+    if category and category != "all":
+        if ObjectId.is_valid(category):
+            q["category_id"] = ObjectId(category)
+        else:
+            found = next((c for c in cats if c.get("name") == category), None)
+            if found:
+                q["category_id"] = found["_id"]
+
+    tags = _arg_list(args, "tags")
+    if tags:
+        op = "$all" if args.get("tag_mode") == "all" else "$in"
+        q["tags"] = {op: tags}
+
+    priorities = [PRIORITY_MAP[p] for p in _arg_list(args, "priority") if p in PRIORITY_MAP]
+    if priorities:
+        q["priority"] = priorities[0] if len(priorities) == 1 else {"$in": priorities}
+
+    due_from, due_to = _parse_day(args.get("due_from")), _parse_day(args.get("due_to"))
+    if due_from or due_to:
+        q["due_date"] = {}
+        if due_from:
+            q["due_date"]["$gte"] = due_from
+        if due_to:
+            q["due_date"]["$lt"] = due_to + timedelta(days=1)
+
+    search = (args.get("search") or "").strip()
+    if search:
+        # Search in title and description using regex
+        q["$or"] = [
+            {"title": {"$regex": search, "$options": "i"}},
+            {"description": {"$regex": search, "$options": "i"}},
+        ]
+
+    return q
+
+
+def sort_spec(sort_type):
+    return SORTS.get(sort_type, SORTS["default"])
+
+
+def facet_counts(q, database=None):
+    """Counts by tag, priority, status and category for the tasks matching ``q``, in one round-trip.
+
+    Pass ``database=read_db()`` (read_routing.py) to let the counts come from a secondary.
+    """
+    database = db if database is None else database
+    pipeline = [
+        {"$match": q},
+        {"$facet": {
+            "tags": [
+                {"$unwind": "$tags"},
+                {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+            ],
+            "priority": [{"$group": {"_id": "$priority", "count": {"$sum": 1}}}],
+            "status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+            "category": [{"$group": {"_id": "$category_id", "count": {"$sum": 1}}}],
+        }},
+    ]
+    result = next(database.tasks.aggregate(pipeline), {})
+    return {name: {b["_id"]: b["count"] for b in buckets} for name, buckets in result.items()}
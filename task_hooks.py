@@ -0,0 +1,29 @@
+# task_hooks.py
+"""Things that must happen after any write to ``db.tasks``.
+
+Every route that inserts, updates or deletes a task calls
+``after_task_write`` so derived data stays in sync: the user's cache
+version is bumped on all workers, the task's urgency score is recomputed
+and their smart lists are updated.
+"""
+from bson import ObjectId
+
+import cache_bus
+import smart_lists
+import urgency
+
+
+def after_task_write(uid, task_id=None):
+    """``task_id=None`` means "many tasks changed" (e.g. bulk import)."""
+    if isinstance(uid, str):
+        uid = ObjectId(uid)
+    if isinstance(task_id, str):
+        task_id = ObjectId(task_id)
+
+    cache_bus.bump(uid)
+
+    if task_id is None:
+        smart_lists.refresh_user(uid)
+    else:
+        urgency.refresh_task(task_id)
+        smart_lists.sync_task(uid, task_id)
@@ -0,0 +1,246 @@
+# task_import.py
+"""Bulk import of tasks from CSV / NDJSON exports.
+
+Rows are parsed one at a time from the uploaded stream, validated with
+``models.TaskIn`` and written with ``insert_many`` in fixed-size chunks, so
+memory use stays flat no matter how big the file is.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+import click
+from bson import ObjectId
+from flask import Blueprint, request, jsonify, session
+from pydantic import ValidationError
+from pymongo import ReturnDocument
+
+from auth import login_required
+from db import db
+from models import TaskIn
+from urgency import urgency_score
+from task_filters import parse_tags
+from task_hooks import after_task_write
+
+import_bp = Blueprint("task_import", __name__, cli_group=None)
+
+BATCH_SIZE = 1000
+MAX_ERRORS_IN_RESPONSE = 100
+PRIORITY_MAP = {"high": 1, "medium": 2, "low": 3}
+PRIORITY_NAMES = {v: k for k, v in PRIORITY_MAP.items()}
+
+
+def iter_rows(stream, fmt):
+    """Yield (line_no, row_dict) from a binary stream, lazily."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_no, line in enumerate(text, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, e
+                continue
+            yield line_no, row
+
+
+def detect_format(filename, explicit=None):
+    if explicit:
+        return explicit.lower()
+    name = (filename or "").lower()
+    return "csv" if name.endswith(".csv") else "ndjson"
+
+
+class CategoryCache:
+    """name -> ObjectId map for one user, loaded once, filled on demand."""
+
+    def __init__(self, uid):
+        self.uid = uid
+        cats = db.categories.find({"user_id": uid}, {"name": 1})
+        self.by_name = {c.get("name", ""): c["_id"] for c in cats}
+        self.ids = set(self.by_name.values())
+        self.created = 0
+
+    def resolve(self, category_id=None, name=None):
+        if category_id and ObjectId.is_valid(category_id) and ObjectId(category_id) in self.ids:
+            return ObjectId(category_id)
+        name = (name or "").strip()
+        if not name:
+            return None
+        if name not in self.by_name:
+            # upsert so two imports racing on the same name don't create duplicates
+            doc = db.categories.find_one_and_update(
+                {"user_id": self.uid, "name": name},
+                {"$setOnInsert": {"user_id": self.uid, "name": name}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+                projection={"_id": 1},
+            )
+            self.by_name[name] = doc["_id"]
+            self.ids.add(doc["_id"])
+            self.created += 1
+        return self.by_name[name]
+
+
+def _text(value, default=""):
+    """Any scalar cell -> stripped str; NDJSON rows may carry numbers, bools, etc."""
+    if value is None or value == "":
+        return default
+    if isinstance(value, (dict, list)):
+        raise ValueError(f"expected a string, got {type(value).__name__}")
+    return str(value).strip()
+
+
+def _priority(value):
+    """'high' / 'High' / 1 / '1' -> 'high'; the app stores priority as 1-3."""
+    if isinstance(value, bool):
+        raise ValueError(f"invalid priority: {value!r}")
+    text = _text(value, "medium").lower()
+    if text.isdigit():
+        if int(text) not in PRIORITY_NAMES:
+            raise ValueError(f"invalid priority: {value!r}")
+        return PRIORITY_NAMES[int(text)]
+    return text
+
+
+def row_to_doc(uid, row, categories, now):
+    """Validate one raw row and build the task document (raises ValueError)."""
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+
+    due_date = None
+    due_date_str = _text(row.get("due_date"))
+    if due_date_str:
+        try:
+            due_date = datetime.strptime(due_date_str[:10], "%Y-%m-%d")
+        except ValueError:
+            raise ValueError(f"invalid due_date: {due_date_str!r}")
+
+    try:
+        payload = TaskIn(
+            title=_text(row.get("title")),
+            category_id=_text(row.get("category_id")) or None,
+            priority=_priority(row.get("priority")),
+            status=_text(row.get("status"), "todo").lower(),
+            due_date=due_date,
+            description=_text(row.get("description")) or None,
+        )
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+
+    doc = {
+        "user_id": uid,
+        "title": payload.title.strip(),
+        "category_id": categories.resolve(payload.category_id, _text(row.get("category"))),
+        "priority": PRIORITY_MAP[payload.priority],
+        "status": payload.status,
+        "due_date": payload.due_date,
+        "description": (payload.description or "").strip(),
+        "tags": parse_tags(row.get("tags")),
+        "created_at": now,
+        "updated_at": now,
+        "version": 1,
+    }
+    doc["urgency"] = urgency_score(doc, now)
+    return doc
+
+
+def import_tasks(uid, rows, on_error=None, on_progress=None, batch_size=BATCH_SIZE):
+    """Insert tasks for ``uid`` from an iterable of (line_no, row).
+
+    ``on_error(line_no, row, message)`` is called for each rejected row and
+    ``on_progress(stats)`` after every flushed batch. Returns the final stats.
+    """
+    categories = CategoryCache(uid)
+    stats = {"read": 0, "inserted": 0, "failed": 0, "categories_created": 0}
+    batch = []
+
+    def flush():
+        if not batch:
+            return
+        db.tasks.insert_many(batch, ordered=False)
+        stats["inserted"] += len(batch)
+        batch.clear()
+        stats["categories_created"] = categories.created
+        if on_progress:
+            on_progress(dict(stats))
+
+    for line_no, row in rows:
+        stats["read"] += 1
+        try:
+            if isinstance(row, Exception):
+                raise ValueError(f"invalid JSON: {row}")
+            batch.append(row_to_doc(uid, row, categories, datetime.utcnow()))
+        except ValueError as e:
+            stats["failed"] += 1
+            if on_error:
+                on_error(line_no, row if isinstance(row, dict) else None, str(e))
+            continue
+        if len(batch) >= batch_size:
+            flush()
+
+    flush()
+    stats["categories_created"] = categories.created
+    if stats["inserted"] or categories.created:
+        after_task_write(uid)
+    return stats
+
+
+@import_bp.post("/api/tasks/import")
+@login_required
+def api_import_tasks():
+    uid = session["user_id"]
+
+    upload = request.files.get("file")
+    if upload is None:
+        return jsonify({"error": "file required"}), 400
+
+    fmt = detect_format(upload.filename, request.args.get("format"))
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+
+    errors = []
+
+    def on_error(line_no, row, message):
+        if len(errors) < MAX_ERRORS_IN_RESPONSE:
+            errors.append({"line": line_no, "error": message})
+
+    stats = import_tasks(ObjectId(uid), iter_rows(upload.stream, fmt), on_error=on_error)
+    return jsonify({**stats, "errors": errors, "errors_truncated": stats["failed"] > len(errors)}), 200
+
+
+@import_bp.cli.command("import-tasks")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--email", required=True, help="Owner of the imported tasks.")
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), default=None)
+@click.option("--errors", "errors_path", type=click.Path(dir_okay=False), default=None,
+              help="Write rejected rows here as NDJSON (default: <path>.errors.ndjson).")
+@click.option("--batch-size", default=BATCH_SIZE, show_default=True)
+def import_tasks_command(path, email, fmt, errors_path, batch_size):
+    """Import tasks for a user from a CSV or NDJSON file."""
+    user = db.users.find_one({"email": email.strip().lower()}, {"_id": 1})
+    if not user:
+        raise click.ClickException(f"no user with email {email}")
+
+    errors_path = errors_path or f"{path}.errors.ndjson"
+    with open(path, "rb") as src, open(errors_path, "w", encoding="utf-8") as err_file:
+        def on_error(line_no, row, message):
+            err_file.write(json.dumps({"line": line_no, "error": message, "row": row}, default=str) + "\n")
+
+        def on_progress(stats):
+            click.echo(f"  {stats['inserted']} inserted, {stats['failed']} failed ({stats['read']} read)")
+
+        stats = import_tasks(user["_id"], iter_rows(src, detect_format(path, fmt)),
+                             on_error=on_error, on_progress=on_progress, batch_size=batch_size)
+
+    click.echo(f"Done: {stats['inserted']} inserted, {stats['failed']} failed, "
+               f"{stats['categories_created']} categories created.")
+    if stats["failed"]:
+        click.echo(f"Rejected rows written to {errors_path}")
@@ -0,0 +1,41 @@
+# task_versions.py
+"""Optimistic concurrency for task writes.
+
+Every task carries an integer ``version``, starting at 1 on insert and
+``$inc``-ed by every update. A client that wants to avoid overwriting
+someone else's change sends the version it last saw, as ``If-Match: "v3"``
+or as a ``version`` form/JSON field. The update filter then includes that
+version, and if nothing matched while the task still exists the write lost
+the race and the route answers 409.
+"""
+import re
+
+_ETAG = re.compile(r'^(?:W/)?"?v?(\d+)"?$')
+
+
+def etag(version):
+    return f'"v{version or 0}"'
+
+
+def expected_version(request, data=None):
+    """Version the client expects to overwrite, or None for an unconditional write."""
+    header = (request.headers.get("If-Match") or "").strip()
+    if header and header != "*":
+        m = _ETAG.match(header)
+        return int(m.group(1)) if m else -1  # unparseable: can never match
+    raw = (data or {}).get("version")
+    if raw in (None, ""):
+        return None
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return -1
+
+
+def version_filter(expected):
+    """Extra update filter for an expected version (0 also matches pre-versioning docs)."""
+    if expected is None:
+        return {}
+    if expected == 0:
+        return {"version": {"$in": [0, None]}}
+    return {"version": expected}
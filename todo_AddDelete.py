@@ -1,9 +1,17 @@
-from flask import request, jsonify, redirect, url_for, session
+from flask import request, jsonify, redirect, url_for, session, flash
 from bson import ObjectId
 from datetime import datetime
 from functools import wraps
 
 from db import db
+from task_filters import parse_tags
+from task_hooks import after_task_write
+from json_provider import stream_json_array
+from task_versions import etag, expected_version, version_filter
+from pymongo import ReturnDocument
+from read_routing import read_db
+from archive import iter_tasks
+from urgency import urgency_score
 
 
 def login_required(f):
@@ -22,12 +30,70 @@ def current_uid():
     return ObjectId(uid) if uid and ObjectId.is_valid(uid) else None
 
 
+TASK_FIELDS = {"title": 1, "category_id": 1, "priority": 1, "status": 1, "due_date": 1,
+               "description": 1, "tags": 1, "created_at": 1, "updated_at": 1, "version": 1}
+
+
+def _task_json(t):
+    t["id"] = t.pop("_id")
+    return t
+
+
+STRING_FIELDS = ("title", "category_id", "priority", "status", "due_date", "description")
+
+
+def _invalid_body(data):
+    """Error message if a JSON body has the wrong shape, else None (form values are always strings)."""
+    if not isinstance(data, dict):
+        return "body must be a JSON object"
+    for name in STRING_FIELDS:
+        if data.get(name) is not None and not isinstance(data[name], str):
+            return f"{name} must be a string"
+    try:
+        parse_tags(data.get("tags"))
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def _conflict_or_missing(task_id, uid):
+    """After a conditional write matched nothing: 409 if the task exists (stale version), else 404."""
+    if db.tasks.find_one({"_id": ObjectId(task_id), "user_id": uid}, {"_id": 1}):
+        return jsonify({"error": "version conflict"}), 409
+    return jsonify({"error": "task not found"}), 404
+
+
 def register_task_routes(app):
     
+    @app.get("/api/tasks")
+    @login_required
+    def api_list_tasks():
+        # both tiers, so archived done tasks are listed too
+        status = (request.args.get("status") or "").lower() or None
+        tasks = iter_tasks(current_uid(), status, read_db(), TASK_FIELDS)
+        return stream_json_array(tasks, _task_json)
+    
+    
+    @app.get("/api/tasks/<task_id>")
+    @login_required
+    def api_get_task(task_id):
+        if not ObjectId.is_valid(task_id):
+            return jsonify({"error": "invalid task id"}), 400
+        
+        task = db.tasks.find_one({"_id": ObjectId(task_id), "user_id": current_uid()}, TASK_FIELDS)
+        if not task:
+            return jsonify({"error": "task not found"}), 404
+        
+        return jsonify(_task_json(task)), 200, {"ETag": etag(task.get("version"))}
+    
+    
     @app.post("/api/tasks")
     @login_required
     def api_add_task():
         data = request.form or request.get_json(silent=True) or {}
+        error = _invalid_body(data)
+        if error:
+            return jsonify({"error": error}), 400
         
         title = (data.get("title") or "").strip()
         if not title:
@@ -39,6 +105,7 @@ def register_task_routes(app):
         status = (data.get("status") or "todo").lower()
         due_date_str = data.get("due_date")
         description = (data.get("description") or "").strip()
+        tags = parse_tags(data.get("tags"))
         
         cat_id = None
         if category_id and ObjectId.is_valid(category_id):
@@ -63,33 +130,51 @@ def register_task_routes(app):
             "status": status,
             "due_date": due_date,
             "description": description,
+            "tags": tags,
             "created_at": now,
             "updated_at": now,
+            "version": 1,
         }
+        task_doc["urgency"] = urgency_score(task_doc, now)
         
         result = db.tasks.insert_one(task_doc)
+        after_task_write(uid, result.inserted_id)
         
         if not request.is_json:
             return redirect(url_for("dashboard"), code=303)
         
-        return jsonify({"created": True, "task_id": str(result.inserted_id)}), 201
+        return jsonify({"created": True, "task_id": str(result.inserted_id), "version": 1}), 201, {"ETag": etag(1)}
     
     
     @app.post("/api/tasks/<task_id>/delete")
     @login_required
     def api_delete_task(task_id):
+        # Also the target of the dashboard's delete form, which gets a flash + redirect
         if not ObjectId.is_valid(task_id):
-            return redirect(url_for("dashboard"), code=303) if not request.is_json else (jsonify({"error": "invalid task id"}), 400)
+            if not request.is_json:
+                flash("Invalid task id.", "error")
+                return redirect(url_for("dashboard"), code=303)
+            return jsonify({"error": "invalid task id"}), 400
         
         uid = current_uid()
+        expected = expected_version(request)
         
-        result = db.tasks.delete_one({"_id": ObjectId(task_id), "user_id": uid})
+        # Delete only if it belongs to the current user (and, with If-Match, only that version)
+        result = db.tasks.delete_one({"_id": ObjectId(task_id), "user_id": uid, **version_filter(expected)})
+        if result.deleted_count:
+            after_task_write(uid, task_id)
         
         if not request.is_json:
+            if result.deleted_count:
+                flash("Task deleted.", "success")
+            elif expected is not None and db.tasks.find_one({"_id": ObjectId(task_id), "user_id": uid}, {"_id": 1}):
+                flash("This task was changed somewhere else, so it was not deleted.", "error")
+            else:
+                flash("Task not found.", "error")
             return redirect(url_for("dashboard"), code=303)
         
         if result.deleted_count == 0:
-            return jsonify({"error": "task not found"}), 404
+            return _conflict_or_missing(task_id, uid)
         
         return jsonify({"deleted": True, "task_id": task_id}), 200
     
@@ -102,15 +187,18 @@ def register_task_routes(app):
         
         uid = current_uid()
         data = request.form or request.get_json(silent=True) or {}
+        error = _invalid_body(data)
+        if error:
+            return jsonify({"error": error}), 400
         update_fields = {}
         
-        if "title" in data and data["title"].strip():
+        if (data.get("title") or "").strip():
             update_fields["title"] = data["title"].strip()
         
-        if "status" in data:
+        if data.get("status"):
             update_fields["status"] = data["status"].lower()
         
-        if "priority" in data:
+        if data.get("priority"):
             priority_map = {"high": 1, "medium": 2, "low": 3}
             update_fields["priority"] = priority_map.get(data["priority"].lower(), 2)
         
@@ -124,22 +212,29 @@ def register_task_routes(app):
                 pass
         
         if "description" in data:
-            update_fields["description"] = data["description"].strip()
+            update_fields["description"] = (data["description"] or "").strip()
+        
+        if "tags" in data:
+            update_fields["tags"] = parse_tags(data["tags"])
         
         if not update_fields:
             return jsonify({"error": "no fields to update"}), 400
         
         update_fields["updated_at"] = datetime.utcnow()
         
-        result = db.tasks.update_one(
-            {"_id": ObjectId(task_id), "user_id": uid},
-            {"$set": update_fields}
+        # Conditional on the client's version when it sends one; no read-before-write needed
+        task = db.tasks.find_one_and_update(
+            {"_id": ObjectId(task_id), "user_id": uid, **version_filter(expected_version(request, data))},
+            {"$set": update_fields, "$inc": {"version": 1}},
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER,
         )
         
-        if result.matched_count == 0:
-            return jsonify({"error": "task not found"}), 404
+        if task is None:
+            return _conflict_or_missing(task_id, uid)
         
-        return jsonify({"updated": True, "task_id": task_id}), 200
+        after_task_write(uid, task_id)
+        return jsonify({"updated": True, "task_id": task_id, "version": task["version"]}), 200, {"ETag": etag(task["version"])}
     
     
     @app.post("/api/tasks/<task_id>/complete")
@@ -152,24 +247,30 @@ def register_task_routes(app):
             return jsonify({"error": "invalid task id"}), 400
         
         uid = current_uid()
+        body = request.get_json(silent=True)
+        expected = expected_version(request, body if isinstance(body, dict) else None)
         
-        result = db.tasks.update_one(
-            {"_id": ObjectId(task_id), "user_id": uid},
+        task = db.tasks.find_one_and_update(
+            {"_id": ObjectId(task_id), "user_id": uid, **version_filter(expected)},
             {"$set": {
                 "status": "done",
                 "completed_at": datetime.utcnow(),
                 "updated_at": datetime.utcnow()
-            }}
+            }, "$inc": {"version": 1}},
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER,
         )
         
-        if result.matched_count == 0:
+        if task is None:
             # If it's a form submission, redirect back to dashboard
             if request.form:
                 return redirect(url_for("dashboard"))
-            return jsonify({"error": "task not found"}), 404
+            return _conflict_or_missing(task_id, uid)
+        
+        after_task_write(uid, task_id)
         
         # If it's a form submission, redirect back to dashboard
         if request.form:
             return redirect(url_for("dashboard"), code=303)
         
-        return jsonify({"completed": True, "task_id": task_id}), 200
\ No newline at end of file
+        return jsonify({"completed": True, "task_id": task_id, "version": task["version"]}), 200, {"ETag": etag(task["version"])}
\ No newline at end of file
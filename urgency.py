@@ -0,0 +1,93 @@
+# urgency.py
+"""Stored urgency score for ``sort=smart``.
+
+The score combines priority, time to the due date and age into one number
+(higher = more urgent) and is kept on the task as ``urgency``, so the
+dashboard can read the top tasks straight off the ``(user_id, urgency,
+due_date)`` index instead of sorting everything in memory. It is computed on insert,
+recomputed after every task write (``task_hooks``), and refreshed in bulk by
+``flask refresh-urgency`` (run it from cron, e.g. hourly) because the due
+date component changes as time passes.
+"""
+from datetime import datetime
+
+import click
+from flask import Blueprint
+from pymongo import UpdateOne
+
+import cache_bus
+import smart_lists
+from db import db
+
+urgency_bp = Blueprint("urgency", __name__, cli_group=None)
+
+PRIORITY_POINTS = {1: 60, 2: 30, 3: 10}
+DUE_POINTS = 80        # a task due right now gets the full amount
+OVERDUE_POINTS = 100   # plus up to OVERDUE_MAX more, growing per day late
+OVERDUE_PER_DAY = 5
+OVERDUE_MAX = 50
+AGE_POINTS_PER_DAY = 0.5
+AGE_MAX_DAYS = 30
+BATCH_SIZE = 1000
+
+SCORE_FIELDS = {"priority": 1, "due_date": 1, "created_at": 1, "status": 1, "urgency": 1, "user_id": 1}
+
+
+def urgency_score(task, now=None):
+    if task.get("status") == "done":
+        return 0.0
+    now = now or datetime.utcnow()
+    priority = task.get("priority")
+    score = PRIORITY_POINTS.get(priority if isinstance(priority, int) else 2, 30)
+
+    due = task.get("due_date")
+    if due:
+        days_left = (due - now).total_seconds() / 86400
+        if days_left < 0:
+            score += OVERDUE_POINTS + min(-days_left * OVERDUE_PER_DAY, OVERDUE_MAX)
+        else:
+            # decays with distance: 80 today, 40 tomorrow, ~10 in a week
+            score += DUE_POINTS / (1 + days_left)
+
+    created = task.get("created_at")
+    if created:
+        age_days = max((now - created).total_seconds() / 86400, 0)
+        score += min(age_days, AGE_MAX_DAYS) * AGE_POINTS_PER_DAY
+
+    return round(score, 2)
+
+
+def refresh_task(task_id):
+    task = db.tasks.find_one({"_id": task_id}, SCORE_FIELDS)
+    if task:
+        score = urgency_score(task)
+        if task.get("urgency") != score:
+            db.tasks.update_one({"_id": task_id}, {"$set": {"urgency": score}})
+
+
+def refresh_all(batch_size=BATCH_SIZE):
+    """Recompute the score of every open task; returns (updated count, affected user ids)."""
+    now = datetime.utcnow()
+    updated, users, ops = 0, set(), []
+    for task in db.tasks.find({"status": {"$ne": "done"}}, SCORE_FIELDS).batch_size(batch_size):
+        score = urgency_score(task, now)
+        if task.get("urgency") == score:
+            continue
+        ops.append(UpdateOne({"_id": task["_id"]}, {"$set": {"urgency": score}}))
+        users.add(task["user_id"])
+        if len(ops) >= batch_size:
+            updated += db.tasks.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += db.tasks.bulk_write(ops, ordered=False).modified_count
+    return updated, users
+
+
+@urgency_bp.cli.command("refresh-urgency")
+def refresh_urgency_command():
+    """Recompute urgency scores for all open tasks."""
+    updated, users = refresh_all()
+    for uid in users:
+        cache_bus.bump(uid)
+        smart_lists.refresh_user(uid, sort="smart")
+    click.echo(f"Updated urgency for {updated} task(s) across {len(users)} user(s).")